@@ -1,12 +1,27 @@
 import os
 import sqlite3
+import threading
+from pathlib import Path
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
+# por debajo de este tamaño numexpr no compensa su arranque frente a NumPy
+NUMEXPR_MIN_ROWS = 50_000
+
+# las claves incluyen el mtime de la BD (o, en las figuras, los valores graficados): al cambiar
+# el archivo, las entradas viejas dejan de usarse y este límite hace que se descarten en lugar de acumularse
+DATA_CACHE_ENTRIES = 64
+
 def get_db_path():
     # Detectar si estamos en Streamlit Cloud
     if os.getenv('STREAMLIT_CLOUD', 'False').lower() == 'true':
@@ -14,60 +29,204 @@ def get_db_path():
     else:
         return os.path.join(os.path.dirname(__file__), "txt_data.db")
 
-def get_record_tables(conn):
-    cur = conn.cursor()
-    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name != 'sqlite_sequence' ORDER BY name")
-    rows = [r[0] for r in cur.fetchall()]
+@st.cache_resource(max_entries=1)
+def get_conn(db_path, mtime):
+    # conexión persistente entre reruns; el mtime en la clave la reabre si cambia la BD
+    # se comparte entre hilos (sesiones concurrentes): el lock serializa su uso, porque
+    # una UDF de Python (py_upper) en una conexión compartida sin serializar puede bloquearse
+    # modo de solo lectura por URI: SQLite no toma locks de escritura ni crea journal
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA mmap_size=268435456")
+    # UPPER de SQLite solo cubre ASCII; py_upper usa str.upper de Python con Unicode completo
+    conn.create_function("py_upper", 1, str.upper, deterministic=True)
+    return conn, threading.Lock()
+
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def get_record_tables(db_path, mtime):
+    conn, lock = get_conn(db_path, mtime)
+    with lock:
+        cur = conn.cursor()
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name != 'sqlite_sequence' ORDER BY name")
+        rows = [r[0] for r in cur.fetchall()]
     return rows
 
-def load_table(conn, table):
-    df = pd.read_sql_query(f'SELECT username, damage FROM "{table}"', conn)
-    df["damage"] = pd.to_numeric(df["damage"], errors="coerce").fillna(0).astype("int64")
-    # normalizar nombres a mayúsculas para evitar sensibilidad en la comparación
-    df["name"] = df["username"].astype(str).str.upper()
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def load_table(db_path, table, mtime):
+    conn, lock = get_conn(db_path, mtime)
+    with lock:
+        df = pd.read_sql_query(
+            f'SELECT username, py_upper(username) AS name, COALESCE(CAST(damage AS INTEGER), 0) AS damage, rounds '
+            f'FROM "{table}"',
+            conn,
+            dtype={"username": "string[pyarrow]", "name": "string[pyarrow]", "damage": "int64[pyarrow]"},
+            dtype_backend="pyarrow",
+        )
+    df["rounds"] = df["rounds"].fillna("N/A")
+    # rounds llega como "hechos/total": is_full marca a quien completó todos sus ataques (21/21);
+    # total > 0 evita contar "0/0" como completo. extract sobre object porque pandas < 2.2
+    # no lo soporta en columnas string[pyarrow]
+    rounds = df["rounds"].astype(object).str.extract(r"^(?P<done>\d+)/(?P<total>\d+)$").astype(float)
+    df["is_full"] = ((rounds["done"] == rounds["total"]) & (rounds["total"] > 0)).to_numpy(dtype=bool)
+    # nombres normalizados con py_upper, la misma función que en load_aggregated: utf8_upper de Arrow
+    # difiere de str.upper en casos especiales (ß -> ẞ frente a SS) y rompería el cruce por nombre
+    df["name"] = df["name"].astype("category")
+    return df
+
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def load_aggregated(db_path, table, mtime):
+    # agrupar y ordenar directamente en SQLite
+    conn, lock = get_conn(db_path, mtime)
+    with lock:
+        df = pd.read_sql_query(
+            f'SELECT py_upper(CAST(username AS TEXT)) AS name, COALESCE(SUM(CAST(damage AS INTEGER)), 0) AS damage '
+            f'FROM "{table}" GROUP BY 1 ORDER BY damage DESC',
+            conn,
+            dtype={"name": "string[pyarrow]", "damage": "int64[pyarrow]"},
+            dtype_backend="pyarrow",
+        )
+    df["name"] = df["name"].astype("category")
     return df
 
-def aggregate(df):
-    # agrupar por nombre (ya en mayúsculas) y sumar daño
-    agg = df.groupby("name", as_index=False)["damage"].sum()
-    return agg
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def load_summary(db_path, table, mtime):
+    # métricas del resumen en una sola consulta: daño total, jugadores distintos y top player
+    conn, lock = get_conn(db_path, mtime)
+    with lock:
+        total, n_players, top_player = conn.execute(
+            f'SELECT COALESCE(SUM(CAST(damage AS INTEGER)), 0), COUNT(DISTINCT py_upper(CAST(username AS TEXT))), '
+            f'(SELECT py_upper(CAST(username AS TEXT)) FROM "{table}" GROUP BY 1 ORDER BY SUM(CAST(damage AS INTEGER)) DESC LIMIT 1) '
+            f'FROM "{table}"'
+        ).fetchone()
+    return total, n_players, top_player
 
-def compute_comparison(prev_df, last_df):
-    # ambas tablas ya tienen nombres normalizados en load_table
-    a = aggregate(prev_df).rename(columns={"damage": "prev_damage"})
-    b = aggregate(last_df).rename(columns={"damage": "last_damage"})
-    merged = pd.merge(a, b, on="name", how="outer").fillna(0)
-    merged["prev_damage"] = merged["prev_damage"].astype("int64")
-    merged["last_damage"] = merged["last_damage"].astype("int64")
+CHANGE_LABELS = np.array(["same", "up", "down", "new"])
+# iconos de la tabla de comparación, en el mismo orden de códigos que CHANGE_LABELS
+CHANGE_ICONS = np.array(["⏺", "🔼", "🔽", "🆕"])
 
+def pct_and_label(pv, ls):
     # pct change: if prev>0 compute, if prev==0 and last>0 mark as inf/new
-    def pct_row(row):
-        pv = row["prev_damage"]
-        ls = row["last_damage"]
-        if pv > 0:
-            return (ls - pv) / pv * 100.0
-        if pv == 0 and ls > 0:
-            return np.inf
-        return 0.0
-
-    merged["pct_change"] = merged.apply(pct_row, axis=1)
-    # label change
-    def label_row(r):
-        if r["pct_change"] == np.inf:
-            return "new"
-        if r["pct_change"] > 0:
-            return "up"
-        if r["pct_change"] < 0:
-            return "down"
-        return "same"
-    merged["change"] = merged.apply(label_row, axis=1)
-    merged = merged.sort_values(by=["pct_change"], ascending=False, key=lambda s: s.replace(np.inf, 1e18) if isinstance(s, pd.Series) else s)
-    return merged
+    # código de tendencia: 0=same, 1=up, 2=down, 3=new (índice en CHANGE_LABELS)
+    if ne is not None and pv.size >= NUMEXPR_MIN_ROWS:
+        # una sola pasada multihilo, sin arrays temporales intermedios
+        pct = ne.evaluate(
+            "where(pv > 0, (ls - pv) / pv * 100.0, where((pv == 0) & (ls > 0), inf, 0.0))",
+            local_dict={"pv": pv.astype(np.float64), "ls": ls.astype(np.float64), "inf": np.inf},
+        )
+    else:
+        pct = np.where(pv > 0, (ls - pv) / np.where(pv > 0, pv, 1) * 100.0, np.where((pv == 0) & (ls > 0), np.inf, 0.0))
+    # inf también cumple pct > 0, así que suma 1 + 2 = 3 (new)
+    code = (pct > 0).astype(np.int8) + 2 * (pct < 0).astype(np.int8) + 2 * np.isinf(pct).astype(np.int8)
+    return pct, code
+
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def compute_comparison(agg_prev, agg_last):
+    # recibe los agregados de load_aggregated: un nombre por fila, ya normalizado con py_upper
+    if not (agg_prev["name"].is_unique and agg_last["name"].is_unique):
+        raise ValueError("compute_comparison espera un nombre por fila en cada tabla")
+    # unificar categorías: los códigos de ambas tablas pasan a indexar el mismo array de nombres
+    cats = agg_prev["name"].cat.categories.union(agg_last["name"].cat.categories)
+    ca = agg_prev["name"].cat.set_categories(cats).cat.codes.to_numpy()
+    cb = agg_last["name"].cat.set_categories(cats).cat.codes.to_numpy()
+    # esparcir el daño por código da los dos vectores alineados sin join ni fillna (ausente = 0)
+    pv = np.zeros(len(cats), dtype=np.int64)
+    ls = np.zeros(len(cats), dtype=np.int64)
+    pv[ca] = agg_prev["damage"].to_numpy()
+    ls[cb] = agg_last["damage"].to_numpy()
+    seen = np.zeros(len(cats), dtype=bool)
+    seen[ca] = True
+    seen[cb] = True
+
+    pct, code = pct_and_label(pv, ls)
+    # +inf (jugadores nuevos) queda primero; estable para que los empates sigan el orden alfabético
+    order = np.argsort(-pct, kind="stable")
+    order = order[seen[order]]
+    return pd.DataFrame({
+        "name": pd.Categorical.from_codes(order, categories=cats),
+        "prev_damage": pv[order],
+        "last_damage": ls[order],
+        "pct_change": pct[order],
+        "change": pd.Categorical.from_codes(code[order], categories=CHANGE_LABELS),
+    })
+
+def top_changes(comp, label, n=10):
+    # top n de una tendencia sin volver a ordenar: una sola pasada sobre la máscara
+    idx = np.flatnonzero((comp["change"] == label).to_numpy())
+    # comp ya viene ordenado por pct_change desc: las subidas mayores son las primeras
+    # posiciones y las bajadas mayores las últimas, así que basta con recortar
+    idx = idx[:n] if label == "up" else idx[-n:][::-1]
+    return comp.iloc[idx]
 
 def fmt_pct(v):
-    if v == np.inf:
-        return "∞"
-    return f"{v:+.2f}%"
+    # formatea el array completo de una vez; inf (jugador nuevo) se muestra como ∞
+    v = np.asarray(v, dtype=np.float64)
+    return np.where(np.isinf(v), "∞", np.char.mod("%+.2f%%", v))
+
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def make_pie(names, damages):
+    # pastel de distribución de daño (cacheado por nombres y daños)
+    fig = px.pie(
+        pd.DataFrame({"name": names, "damage": damages}),
+        values='damage',
+        names='name',
+        title='Top 10 Players - Distribución de Daño',
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(showlegend=True, height=400)
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def make_damage_bar(names, damages):
+    # barras horizontales de daño total; recibe los datos ya en orden ascendente
+    fig = px.bar(
+        pd.DataFrame({"name": names, "damage": damages}),
+        x='damage',
+        y='name',
+        title='Top 10 Players - Daño Total',
+        orientation='h',
+        color='damage',
+        color_continuous_scale='viridis'
+    )
+    fig.update_layout(height=400, showlegend=False)
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def make_change_bar(names, pcts, color, title):
+    # barras de cambio porcentual para el top de incrementos o decrementos
+    fig = go.Figure(data=[
+        go.Bar(
+            x=list(names),
+            y=np.asarray(pcts),
+            marker_color=color,
+            text=[f"{x:+.1f}%" for x in pcts],
+            textposition='auto',
+        )
+    ])
+    fig.update_layout(
+        title=title,
+        xaxis_title='Jugador',
+        yaxis_title='Cambio Porcentual',
+        height=400,
+        showlegend=False
+    )
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def make_active_bar(usernames, damages):
+    # barras de los jugadores 21/21, en orden ascendente
+    fig = px.bar(
+        pd.DataFrame({"username": usernames, "damage": damages}).sort_values('damage', ascending=True),
+        x='damage',
+        y='username',
+        orientation='h',
+        title='🏆 Top 15 Jugadores Activos (21/21)',
+        color='damage',
+        color_continuous_scale='plasma',
+        labels={'damage': 'Damage', 'username': 'Jugador'}
+    )
+    fig.update_layout(height=600, showlegend=False)
+    return fig
 
 def main():
     # Configuración de la página con tema personalizado
@@ -117,11 +276,11 @@ def main():
         st.error(f"No se encontró la BD: {db_path}")
         return
 
-    conn = sqlite3.connect(db_path)
-    tables = get_record_tables(conn)
+    # mtime como clave de caché: si la BD cambia, se invalidan los datos cacheados
+    mtime = os.path.getmtime(db_path)
+    tables = get_record_tables(db_path, mtime)
     if not tables:
         st.info("No hay tablas en la BD.")
-        conn.close()
         return
 
     # Navegación por páginas - al inicio para controlar toda la vista
@@ -137,35 +296,27 @@ def main():
         sel_table = st.selectbox("Seleccionar tabla para vista completa", tables, index=len(tables)-1)
         
         # Cargar datos de la tabla seleccionada
-        table_df = load_table(conn, sel_table)
-        if not table_df.empty:
+        table_agg = load_aggregated(db_path, sel_table, mtime)
+        if not table_agg.empty:
             # Obtener rounds de la tabla seleccionada
-            table_rounds = pd.read_sql_query(f'SELECT username, rounds FROM "{sel_table}"', conn)
-            table_rounds['rounds'] = table_rounds['rounds'].fillna('N/A')
-            table_rounds['name'] = table_rounds['username'].astype(str).str.upper()
-            
-            # Agrupar y ordenar datos
-            table_agg = aggregate(table_df).sort_values("damage", ascending=False).reset_index(drop=True)
+            table_rounds = load_table(db_path, sel_table, mtime)
             
             # Unir con rounds
             table_display = table_agg.merge(table_rounds[['name', 'rounds']], on='name', how='left')
             table_display['rounds'] = table_display['rounds'].fillna('N/A')
             
             # Agregar posición
-            table_display = table_display.reset_index(drop=True)
-            table_display.index = table_display.index + 1
-            table_display = table_display.rename_axis('#')
+            # merge ya devuelve un índice 0..n-1: asignar el rango 1..n in situ evita rehacer el frame
+            table_display.index = pd.RangeIndex(1, len(table_display) + 1, name='#')
             
             st.dataframe(table_display.rename(columns={
                 "#": "Posición",
                 "name": "Jugador", 
                 "damage": "Daño", 
                 "rounds": "Rounds"
-            }), use_container_width=True, height=1090)
+            }), column_config={"Daño": st.column_config.NumberColumn(format="%,d")}, use_container_width=True, height=1090)
         else:
             st.warning(f"No hay datos disponibles en la tabla {sel_table}")
-        
-        conn.close()
         return
 
     st.markdown("---")
@@ -177,13 +328,16 @@ def main():
     sel_last = st.sidebar.selectbox("Tabla última", tables, index=len(tables)-1)
     sel_prev = st.sidebar.selectbox("Tabla anterior", tables, index=max(0, len(tables)-2))
 
-    # Cargar datos
-    last_df = load_table(conn, sel_last)
-    prev_df = load_table(conn, sel_prev)
+    # misma tabla en ambos lados: no hay nada que comparar, así que no se carga ni se calcula la comparación
+    same_table = sel_prev == sel_last
+
+    # Cargar datos: de la tabla anterior solo hace falta el agregado por jugador, ya calculado en SQLite
+    last_df = load_table(db_path, sel_last, mtime)
+    agg_prev = None if same_table else load_aggregated(db_path, sel_prev, mtime)
 
     # Participación actual (última tabla)
-    total = last_df["damage"].sum()
-    agg_last = aggregate(last_df).sort_values("damage", ascending=False).reset_index(drop=True)
+    total, n_players, top_player = load_summary(db_path, sel_last, mtime)
+    agg_last = load_aggregated(db_path, sel_last, mtime)
     agg_last["pct"] = agg_last["damage"] / total * 100.0 if total > 0 else 0.0
 
     # Métricas principales con diseño mejorado
@@ -202,12 +356,12 @@ def main():
         st.markdown(f"""
         <div class="metric-card">
             <h3 style="margin: 0; color: white;">👥 Jugadores</h3>
-            <p style="font-size: 1.5rem; margin: 0; color: white;">{len(agg_last)}</p>
+            <p style="font-size: 1.5rem; margin: 0; color: white;">{n_players}</p>
         </div>
         """, unsafe_allow_html=True)
     
     with col3:
-        avg_damage = total // len(agg_last) if len(agg_last) > 0 else 0
+        avg_damage = total // n_players if n_players > 0 else 0
         st.markdown(f"""
         <div class="metric-card">
             <h3 style="margin: 0; color: white;">📊 Promedio</h3>
@@ -219,29 +373,21 @@ def main():
         st.markdown(f"""
         <div class="metric-card">
             <h3 style="margin: 0; color: white;">🎯 Top Player</h3>
-            <p style="font-size: 1.2rem; margin: 0; color: white;">{agg_last.iloc[0]['name'] if len(agg_last) > 0 else 'N/A'}</p>
+            <p style="font-size: 1.2rem; margin: 0; color: white;">{top_player or 'N/A'}</p>
         </div>
         """, unsafe_allow_html=True)
     
     st.markdown("---")
 
     # Mostrar participación - todos los jugadores
-    display = agg_last.copy()
-    display = display.copy()
-    display["pct"] = display["pct"].map(lambda v: f"{v:.2f}%")
-    # Obtener rounds de cada jugador
-    rounds_data = pd.read_sql_query(f'SELECT username, rounds FROM "{sel_last}"', conn)
-    rounds_data['rounds'] = rounds_data['rounds'].fillna('N/A')
-    # Normalizar nombres en rounds_data a mayúsculas
-    rounds_data['name'] = rounds_data['username'].astype(str).str.upper()
-    # Unir rounds con el display usando el nombre normalizado
-    display = display.merge(rounds_data[['name', 'rounds']], on='name', how='left')
+    display = agg_last.assign(pct=[f"{v:.2f}%" for v in agg_last["pct"].tolist()])
+    # Unir rounds (ya incluidos en last_df) con el display usando el nombre normalizado
+    display = display.merge(last_df[['name', 'rounds']], on='name', how='left')
     display['rounds'] = display['rounds'].fillna('N/A')
     
     # Agregar columna de posición numerada desde 1
-    display = display.reset_index(drop=True)
-    display.index = display.index + 1
-    display = display.rename_axis('#')
+    # merge ya devuelve un índice 0..n-1: asignar el rango 1..n in situ evita rehacer el frame
+    display.index = pd.RangeIndex(1, len(display) + 1, name='#')
     
     st.subheader("Participación por jugador (última tabla)")
     st.dataframe(display.rename(columns={
@@ -250,145 +396,100 @@ def main():
         "damage": "Daño", 
         "pct": "% Participación",
         "rounds": "Rounds"
-    }), use_container_width=True, height="auto")
+    }), column_config={"Daño": st.column_config.NumberColumn(format="%,d")}, use_container_width=True, height="auto")
     #st.bar_chart(agg_last.set_index("name")["pct"])
 
     # Gráfico de pastel para participación
     st.markdown("---")
     st.markdown("### 🎯 Distribución del Daño")
+    top10 = agg_last.head(10)
+    # agg_last ya viene ordenado desc: invertir la vista basta para las barras ascendentes
+    top10_asc = top10.iloc[::-1]
     col1, col2 = st.columns(2)
     
     with col1:
         # Gráfico de pastel interactivo
-        fig_pie = px.pie(
-            agg_last.head(10), 
-            values='damage', 
-            names='name',
-            title='Top 10 Players - Distribución de Daño',
-            color_discrete_sequence=px.colors.qualitative.Set3
-        )
-        fig_pie.update_traces(textposition='inside', textinfo='percent+label')
-        fig_pie.update_layout(showlegend=True, height=400)
+        fig_pie = make_pie(tuple(top10["name"]), tuple(top10["damage"]))
         st.plotly_chart(fig_pie, use_container_width=True)
     
     with col2:
         # Gráfico de barras horizontal
-        fig_bar = px.bar(
-            agg_last.head(10).sort_values('damage', ascending=True),
-            x='damage', 
-            y='name',
-            title='Top 10 Players - Daño Total',
-            orientation='h',
-            color='damage',
-            color_continuous_scale='viridis'
-        )
-        fig_bar.update_layout(height=400, showlegend=False)
+        fig_bar = make_damage_bar(tuple(top10_asc["name"]), tuple(top10_asc["damage"]))
         st.plotly_chart(fig_bar, use_container_width=True)
     
 
     # Comparación / Tendencias
     st.markdown("---")
     st.subheader("Tendencias: comparación entre tablas")
-    st.write(f"Comparando: `{sel_prev}` → `{sel_last}`")
-    comp = compute_comparison(prev_df, last_df)
-
-    # resumen rápido
-    increased = (comp["change"] == "up").sum()
-    decreased = (comp["change"] == "down").sum()
-    new_players = (comp["change"] == "new").sum()
-    st.write(f"↑ {increased} incrementos — ↓ {decreased} decrementos — ✨ {new_players} nuevos (prev=0)")
-
-    # Mostrar tabla de comparación con formato
-    comp_display = comp.copy()
-    comp_display["pct_change"] = comp_display["pct_change"].map(fmt_pct)
-    # Mapear tipos a iconos
-    icon_map = {
-        "up": "🔼",
-        "down": "🔽", 
-        "new": "🆕",
-        "same": "⏺"
-    }
-    comp_display["Tipo"] = comp_display["change"].map(icon_map)
-    comp_display = comp_display.rename(columns={
-        "name": "Jugador", 
-        "prev_damage": "Prev (daño)", 
-        "last_damage": "Last (daño)", 
-        "pct_change": "% Cambio"
-    })
-    comp_display_show = comp_display.copy()
-    # Reordenar columnas para poner "Tipo" primero
-    columns_order = ["Tipo", "Jugador", "Prev (daño)", "Last (daño)", "% Cambio"]
-    st.dataframe(
-        comp_display_show[columns_order], 
-        use_container_width=True,
-        column_config={
-            "Tipo": st.column_config.TextColumn(
-                "Tipo",
-                width=None
-
-            )
-        }
-    )
+    if same_table:
+        st.info("🔁 Selecciona tablas distintas para comparar")
+    else:
+        st.write(f"Comparando: `{sel_prev}` → `{sel_last}`")
+        comp = compute_comparison(agg_prev, agg_last)
 
-    # Obtener datos para top mejoras y empeoramientos
-    top_up = comp[comp["change"] == "up"].nlargest(10, "pct_change")
-    top_down = comp[comp["change"] == "down"].nsmallest(10, "pct_change")
+        # resumen rápido
+        _, increased, decreased, new_players = np.bincount(comp["change"].cat.codes.to_numpy(), minlength=len(CHANGE_LABELS))
+        st.write(f"↑ {increased} incrementos — ↓ {decreased} decrementos — ✨ {new_players} nuevos (prev=0)")
 
-    # Gráficos mejorados con Plotly para tendencias
-    st.markdown("---")
-    st.markdown("### 📈 Análisis de Tendencias")
-    col1, col2 = st.columns(2)
+        # Mostrar tabla de comparación con formato y tipos mapeados a iconos
+        comp_display = comp.assign(
+            pct_change=fmt_pct(comp["pct_change"].to_numpy()),
+            Tipo=CHANGE_ICONS[comp["change"].cat.codes.to_numpy()],
+        ).rename(columns={
+            "name": "Jugador", 
+            "prev_damage": "Prev (daño)", 
+            "last_damage": "Last (daño)", 
+            "pct_change": "% Cambio"
+        })
+        # Reordenar columnas para poner "Tipo" primero
+        columns_order = ["Tipo", "Jugador", "Prev (daño)", "Last (daño)", "% Cambio"]
+        st.dataframe(
+            comp_display[columns_order], 
+            use_container_width=True,
+            column_config={
+                "Tipo": st.column_config.TextColumn(
+                    "Tipo",
+                    width=None
+
+                ),
+                "Prev (daño)": st.column_config.NumberColumn(format="%,d"),
+                "Last (daño)": st.column_config.NumberColumn(format="%,d"),
+            }
+        )
+
+        # Obtener datos para top mejoras y empeoramientos
+        top_up = top_changes(comp, "up")
+        top_down = top_changes(comp, "down")
+
+        # Gráficos mejorados con Plotly para tendencias
+        st.markdown("---")
+        st.markdown("### 📈 Análisis de Tendencias")
+        col1, col2 = st.columns(2)
     
-    with col1:
-        if not top_up.empty:
-            # Gráfico de barras mejorado para top aumentos
-            fig_up = go.Figure(data=[
-                go.Bar(
-                    x=top_up['name'],
-                    y=top_up['pct_change'],
-                    marker_color='lightgreen',
-                    text=top_up['pct_change'].apply(lambda x: f"{x:+.1f}%"),
-                    textposition='auto',
+        with col1:
+            if not top_up.empty:
+                # Gráfico de barras mejorado para top aumentos
+                fig_up = make_change_bar(
+                    tuple(top_up['name']), tuple(top_up['pct_change']), 'lightgreen', '🚀 Top 10 Mayores Incrementos (%)'
                 )
-            ])
-            fig_up.update_layout(
-                title='🚀 Top 10 Mayores Incrementos (%)',
-                xaxis_title='Jugador',
-                yaxis_title='Cambio Porcentual',
-                height=400,
-                showlegend=False
-            )
-            st.plotly_chart(fig_up, use_container_width=True)
-        else:
-            st.info("🚀 No hay incrementos detectados.")
+                st.plotly_chart(fig_up, use_container_width=True)
+            else:
+                st.info("🚀 No hay incrementos detectados.")
     
-    with col2:
-        if not top_down.empty:
-            # Gráfico de barras mejorado para top decrementos
-            fig_down = go.Figure(data=[
-                go.Bar(
-                    x=top_down['name'],
-                    y=top_down['pct_change'],
-                    marker_color='lightcoral',
-                    text=top_down['pct_change'].apply(lambda x: f"{x:+.1f}%"),
-                    textposition='auto',
+        with col2:
+            if not top_down.empty:
+                # Gráfico de barras mejorado para top decrementos
+                fig_down = make_change_bar(
+                    tuple(top_down['name']), tuple(top_down['pct_change']), 'lightcoral', '📉 Top 10 Mayores Decrementos (%)'
                 )
-            ])
-            fig_down.update_layout(
-                title='📉 Top 10 Mayores Decrementos (%)',
-                xaxis_title='Jugador',
-                yaxis_title='Cambio Porcentual',
-                height=400,
-                showlegend=False
-            )
-            st.plotly_chart(fig_down, use_container_width=True)
-        else:
-            st.info("📉 No hay decrementos detectados.")
-    st.markdown("""
-    <div style="background: #667eea; padding: 1rem; border-radius: 10px; color: white; margin-top: 1rem; width: 100%;">
-        <p style="margin: 0; font-size: 0.9rem;">💡 <strong>Nota:</strong> Esta comparación muestra la diferencia del daño de cada jugador entre la raid anterior y la pasada.</p>
-    </div>
-    """, unsafe_allow_html=True)
+                st.plotly_chart(fig_down, use_container_width=True)
+            else:
+                st.info("📉 No hay decrementos detectados.")
+        st.markdown("""
+        <div style="background: #667eea; padding: 1rem; border-radius: 10px; color: white; margin-top: 1rem; width: 100%;">
+            <p style="margin: 0; font-size: 0.9rem;">💡 <strong>Nota:</strong> Esta comparación muestra la diferencia del daño de cada jugador entre la raid anterior y la pasada.</p>
+        </div>
+        """, unsafe_allow_html=True)
     
     
     # # Gráfico de dispersión para comparación
@@ -437,17 +538,12 @@ def main():
     st.markdown("---")
     st.markdown("### 🏆 Jugadores Más Activos (21/21 Rounds)")
     
-    # Obtener datos de rounds de la tabla actual
-    rounds_data = pd.read_sql_query(f'SELECT username, rounds, damage FROM "{sel_last}"', conn)
-    rounds_data['rounds'] = rounds_data['rounds'].fillna('N/A')
-    
-    # Filtrar jugadores con 21/21
-    active_players = rounds_data[rounds_data['rounds'] == '21/21'].copy()
+    # Filtrar jugadores con 21/21 sobre la misma lectura de la tabla actual
+    active_players = last_df[last_df['is_full']]
     
     if not active_players.empty:
         # Ordenar por damage
         active_players = active_players.sort_values('damage', ascending=False)
-        active_players['formatted_damage'] = active_players['damage'].apply(lambda x: f"{x:,}")
         
         # Métricas de jugadores activos
         total_active = len(active_players)
@@ -482,7 +578,7 @@ def main():
             """, unsafe_allow_html=True)
         
         # Porcentaje de participación de jugadores activos
-        active_participation = (total_active / len(agg_last)) * 100
+        active_participation = (total_active / n_players) * 100
         st.markdown(f"""
         #### 📈 Participación
         **{active_participation:.1f}%** de los jugadores completaron todos sus ataques (21/21)
@@ -491,13 +587,13 @@ def main():
         # Tabla de jugadores activos
         st.markdown("#### 🏅 Ranking de Jugadores Activos")
         
-        # Crear tabla formateada
-        display_active = active_players[['username', 'formatted_damage']].copy()
-        display_active.columns = ['Jugador', 'Damage Formateado']
-        
-        # Añadir posición en el ranking
-        display_active['Posición'] = range(1, len(display_active) + 1)
-        display_active = display_active[['Posición', 'Jugador', 'Damage Formateado']]
+        # Crear la tabla directamente en Arrow (el índice se oculta, no hace falta pandas);
+        # el daño va como entero y los separadores de miles los pone column_config en el navegador
+        display_active = pa.table({
+            'Posición': pa.array(np.arange(1, len(active_players) + 1, dtype=np.int32)),
+            'Jugador': pa.array(active_players['username']),
+            'Damage': pa.array(active_players['damage']),
+        })
         
 
         # Aplicar estilo a la tabla
@@ -505,25 +601,15 @@ def main():
             display_active,
             column_config={
                 "Posición": st.column_config.NumberColumn(format="%d"),
-                #"Damage": st.column_config.NumberColumn(format="%,d"),
-                "Damage Formateado": st.column_config.TextColumn("Damage")
+                "Damage": st.column_config.NumberColumn(format="%,d"),
             },
             hide_index=True,
             use_container_width=True
         )
         
         # Gráfico de barras para jugadores activos
-        fig_active = px.bar(
-            active_players.head(15).sort_values('damage', ascending=True),
-            x='damage',
-            y='username',
-            orientation='h',
-            title='🏆 Top 15 Jugadores Activos (21/21)',
-            color='damage',
-            color_continuous_scale='plasma',
-            labels={'damage': 'Damage', 'username': 'Jugador'}
-        )
-        fig_active.update_layout(height=600, showlegend=False)
+        top_active = active_players.head(15)
+        fig_active = make_active_bar(tuple(top_active['username']), tuple(top_active['damage']))
         st.plotly_chart(fig_active, use_container_width=True)
         
         
@@ -531,7 +617,5 @@ def main():
     else:
         st.info("🔍 No se encontraron jugadores con 21/21 rounds en esta raid.")
 
-    conn.close()
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
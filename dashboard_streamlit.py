@@ -1,7 +1,10 @@
 import os
 import sqlite3
+import threading
+from pathlib import Path
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
@@ -9,6 +12,18 @@ from plotly.subplots import make_subplots
 import requests
 from datetime import datetime
 
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
+# por debajo de este tamaño numexpr no compensa su arranque frente a NumPy
+NUMEXPR_MIN_ROWS = 50_000
+
+# las claves incluyen el mtime de la BD (o, en las figuras, los valores graficados): al cambiar
+# el archivo, las entradas viejas dejan de usarse y este límite hace que se descarten en lugar de acumularse
+DATA_CACHE_ENTRIES = 64
+
 # Configuración para Streamlit Cloud
 IS_STREAMLIT_CLOUD = os.getenv('STREAMLIT_CLOUD', 'False').lower() == 'true'
 
@@ -20,62 +35,195 @@ def get_db_path():
     else:
         return os.path.join(os.path.dirname(__file__), "txt_data.db")
 
-def get_record_tables(conn):
+@st.cache_resource(max_entries=1)
+def get_conn(db_path, mtime):
+    """Conexión SQLite persistente de solo lectura y su lock, compartidos entre reruns y sesiones"""
+    # modo de solo lectura por URI: SQLite no toma locks de escritura ni crea journal
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA mmap_size=268435456")
+    # UPPER de SQLite solo cubre ASCII; py_upper usa str.upper de Python con Unicode completo
+    conn.create_function("py_upper", 1, str.upper, deterministic=True)
+    # la conexión se usa desde varios hilos; sin serializar, la UDF py_upper puede bloquearse
+    return conn, threading.Lock()
+
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def get_record_tables(db_path, mtime):
     """Obtener tablas disponibles"""
-    cur = conn.cursor()
-    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name != 'sqlite_sequence' ORDER BY name DESC")
-    rows = [r[0] for r in cur.fetchall()]
+    conn, lock = get_conn(db_path, mtime)
+    with lock:
+        cur = conn.cursor()
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name != 'sqlite_sequence' ORDER BY name DESC")
+        rows = [r[0] for r in cur.fetchall()]
     return rows
 
-def load_table(conn, table):
-    """Cargar datos de tabla específica"""
-    df = pd.read_sql_query(f'SELECT username, damage FROM "{table}"', conn)
-    df["damage"] = pd.to_numeric(df["damage"], errors="coerce").fillna(0).astype("int64")
-    df["name"] = df["username"].astype(str).str.upper()
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def load_table(db_path, table, mtime):
+    """Cargar daño y rounds de tabla específica"""
+    conn, lock = get_conn(db_path, mtime)
+    with lock:
+        df = pd.read_sql_query(
+            f'SELECT username, py_upper(username) AS name, COALESCE(CAST(damage AS INTEGER), 0) AS damage, rounds '
+            f'FROM "{table}"',
+            conn,
+            dtype={"username": "string[pyarrow]", "name": "string[pyarrow]", "damage": "int64[pyarrow]"},
+            dtype_backend="pyarrow",
+        )
+    df["rounds"] = df["rounds"].fillna("N/A")
+    rounds = df["rounds"].astype(object).str.extract(r"^(?P<done>\d+)/(?P<total>\d+)$").astype(float)
+    df["is_full"] = ((rounds["done"] == rounds["total"]) & (rounds["total"] > 0)).to_numpy(dtype=bool)
+    df["name"] = df["name"].astype("category")
+    return df
+
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def load_aggregated(db_path, table, mtime):
+    """Daño total por jugador, agrupado y ordenado en SQLite"""
+    conn, lock = get_conn(db_path, mtime)
+    with lock:
+        df = pd.read_sql_query(
+            f'SELECT py_upper(CAST(username AS TEXT)) AS name, COALESCE(SUM(CAST(damage AS INTEGER)), 0) AS damage '
+            f'FROM "{table}" GROUP BY 1 ORDER BY damage DESC',
+            conn,
+            dtype={"name": "string[pyarrow]", "damage": "int64[pyarrow]"},
+            dtype_backend="pyarrow",
+        )
+    df["name"] = df["name"].astype("category")
     return df
 
-def aggregate(df):
-    """Agrupar datos por jugador"""
-    agg = df.groupby("name", as_index=False)["damage"].sum()
-    return agg
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def load_summary(db_path, table, mtime):
+    """Daño total, número de jugadores y top player en una sola consulta"""
+    conn, lock = get_conn(db_path, mtime)
+    with lock:
+        total, n_players, top_player = conn.execute(
+            f'SELECT COALESCE(SUM(CAST(damage AS INTEGER)), 0), COUNT(DISTINCT py_upper(CAST(username AS TEXT))), '
+            f'(SELECT py_upper(CAST(username AS TEXT)) FROM "{table}" GROUP BY 1 ORDER BY SUM(CAST(damage AS INTEGER)) DESC LIMIT 1) '
+            f'FROM "{table}"'
+        ).fetchone()
+    return total, n_players, top_player
+
+CHANGE_LABELS = np.array(["same", "up", "down", "new"])
+CHANGE_ICONS = np.array(["⏺", "🔼", "🔽", "🆕"])
+
+def pct_and_label(pv, ls):
+    """Cambio porcentual y código de tendencia (0=same, 1=up, 2=down, 3=new)"""
+    if ne is not None and pv.size >= NUMEXPR_MIN_ROWS:
+        # una sola pasada multihilo, sin arrays temporales intermedios
+        pct = ne.evaluate(
+            "where(pv > 0, (ls - pv) / pv * 100.0, where((pv == 0) & (ls > 0), inf, 0.0))",
+            local_dict={"pv": pv.astype(np.float64), "ls": ls.astype(np.float64), "inf": np.inf},
+        )
+    else:
+        pct = np.where(pv > 0, (ls - pv) / np.where(pv > 0, pv, 1) * 100.0, np.where((pv == 0) & (ls > 0), np.inf, 0.0))
+    # inf también cumple pct > 0, así que suma 1 + 2 = 3 (new)
+    code = (pct > 0).astype(np.int8) + 2 * (pct < 0).astype(np.int8) + 2 * np.isinf(pct).astype(np.int8)
+    return pct, code
 
-def compute_comparison(prev_df, last_df):
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def compute_comparison(agg_prev, agg_last):
     """Calcular comparación entre raids"""
-    a = aggregate(prev_df).rename(columns={"damage": "prev_damage"})
-    b = aggregate(last_df).rename(columns={"damage": "last_damage"})
-    merged = pd.merge(a, b, on="name", how="outer").fillna(0)
-    merged["prev_damage"] = merged["prev_damage"].astype("int64")
-    merged["last_damage"] = merged["last_damage"].astype("int64")
+    if not (agg_prev["name"].is_unique and agg_last["name"].is_unique):
+        raise ValueError("compute_comparison espera un nombre por fila en cada tabla")
+    cats = agg_prev["name"].cat.categories.union(agg_last["name"].cat.categories)
+    ca = agg_prev["name"].cat.set_categories(cats).cat.codes.to_numpy()
+    cb = agg_last["name"].cat.set_categories(cats).cat.codes.to_numpy()
+    pv = np.zeros(len(cats), dtype=np.int64)
+    ls = np.zeros(len(cats), dtype=np.int64)
+    pv[ca] = agg_prev["damage"].to_numpy()
+    ls[cb] = agg_last["damage"].to_numpy()
+    seen = np.zeros(len(cats), dtype=bool)
+    seen[ca] = True
+    seen[cb] = True
 
-    def pct_row(row):
-        pv = row["prev_damage"]
-        ls = row["last_damage"]
-        if pv > 0:
-            return (ls - pv) / pv * 100.0
-        if pv == 0 and ls > 0:
-            return np.inf
-        return 0.0
+    pct, code = pct_and_label(pv, ls)
+    order = np.argsort(-pct, kind="stable")
+    order = order[seen[order]]
+    return pd.DataFrame({
+        "name": pd.Categorical.from_codes(order, categories=cats),
+        "prev_damage": pv[order],
+        "last_damage": ls[order],
+        "pct_change": pct[order],
+        "change": pd.Categorical.from_codes(code[order], categories=CHANGE_LABELS),
+    })
 
-    merged["pct_change"] = merged.apply(pct_row, axis=1)
-    
-    def label_row(r):
-        if r["pct_change"] == np.inf:
-            return "new"
-        if r["pct_change"] > 0:
-            return "up"
-        if r["pct_change"] < 0:
-            return "down"
-        return "same"
-    
-    merged["change"] = merged.apply(label_row, axis=1)
-    merged = merged.sort_values(by=["pct_change"], ascending=False, key=lambda s: s.replace(np.inf, 1e18) if isinstance(s, pd.Series) else s)
-    return merged
+def top_changes(comp, label, n=10):
+    """Top n jugadores con tendencia `label` ("up": mayores subidas, "down": mayores bajadas)"""
+    idx = np.flatnonzero((comp["change"] == label).to_numpy())
+    # comp ya viene ordenado por pct_change desc: las subidas mayores son las primeras
+    # posiciones y las bajadas mayores las últimas, así que basta con recortar
+    idx = idx[:n] if label == "up" else idx[-n:][::-1]
+    return comp.iloc[idx]
 
 def fmt_pct(v):
-    """Formatear porcentaje"""
-    if v == np.inf:
-        return "∞"
-    return f"{v:+.2f}%"
+    """Formatear porcentajes (vectorizado sobre el array completo)"""
+    v = np.asarray(v, dtype=np.float64)
+    return np.where(np.isinf(v), "∞", np.char.mod("%+.2f%%", v))
+
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def make_pie(names, damages):
+    """Pastel de distribución de daño (cacheado por nombres y daños)"""
+    fig = px.pie(
+        pd.DataFrame({"name": names, "damage": damages}),
+        values='damage',
+        names='name',
+        title='Top 10 Players - Distribución de Daño',
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(showlegend=True, height=400)
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def make_damage_bar(names, damages):
+    """Barras horizontales de daño total; recibe los datos ya en orden ascendente"""
+    fig = px.bar(
+        pd.DataFrame({"name": names, "damage": damages}),
+        x='damage',
+        y='name',
+        title='Top 10 Players - Daño Total',
+        orientation='h',
+        color='damage',
+        color_continuous_scale='viridis'
+    )
+    fig.update_layout(height=400, showlegend=False)
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def make_change_bar(names, pcts, color, title):
+    """Barras de cambio porcentual para el top de incrementos o decrementos"""
+    fig = go.Figure(data=[
+        go.Bar(
+            x=list(names),
+            y=np.asarray(pcts),
+            marker_color=color,
+            text=[f"{x:+.1f}%" for x in pcts],
+            textposition='auto',
+        )
+    ])
+    fig.update_layout(
+        title=title,
+        xaxis_title='Jugador',
+        yaxis_title='Cambio Porcentual',
+        height=400,
+        showlegend=False
+    )
+    return fig
+
+@st.cache_data(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def make_active_bar(usernames, damages):
+    """Barras de los jugadores 21/21, en orden ascendente"""
+    fig = px.bar(
+        pd.DataFrame({"username": usernames, "damage": damages}).sort_values('damage', ascending=True),
+        x='damage',
+        y='username',
+        orientation='h',
+        title='🏆 Top 15 Jugadores Activos (21/21)',
+        color='damage',
+        color_continuous_scale='plasma',
+        labels={'damage': 'Damage', 'username': 'Jugador'}
+    )
+    fig.update_layout(height=600, showlegend=False)
+    return fig
 
 def main():
     # Configuración de página optimizada para Streamlit Cloud
@@ -144,9 +292,8 @@ def main():
     db_path = get_db_path()
     
     try:
-        conn = sqlite3.connect(db_path)
-        tables = get_record_tables(conn)
-        conn.close()
+        mtime = os.path.getmtime(db_path)
+        tables = get_record_tables(db_path, mtime)
     except Exception as e:
         st.error(f"❌ Error conectando a la base de datos: {e}")
         return
@@ -163,19 +310,20 @@ def main():
     sel_prev = st.sidebar.selectbox("Tabla Anterior", tables, index=max(0, len(tables)-2) if len(tables) >= 2 else 0)
     top_n = st.sidebar.number_input("Top N jugadores", min_value=0, value=10, step=1)
     
-    # Cargar datos
-    conn = sqlite3.connect(db_path)
-    last_df = load_table(conn, sel_last)
-    prev_df = load_table(conn, sel_prev)
-    conn.close()
+    same_table = sel_prev == sel_last
+    
+    # Cargar datos (cacheado por tabla y mtime de la BD); de la tabla anterior solo hace
+    # falta el agregado por jugador
+    last_df = load_table(db_path, sel_last, mtime)
+    agg_prev = None if same_table else load_aggregated(db_path, sel_prev, mtime)
     
-    if last_df.empty or prev_df.empty:
+    if last_df.empty or (agg_prev is not None and agg_prev.empty):
         st.error("❌ No se pudieron cargar los datos")
         return
     
     # Participación actual
-    total = last_df["damage"].sum()
-    agg_last = aggregate(last_df).sort_values("damage", ascending=False).reset_index(drop=True)
+    total, n_players, top_player = load_summary(db_path, sel_last, mtime)
+    agg_last = load_aggregated(db_path, sel_last, mtime)
     agg_last["pct"] = agg_last["damage"] / total * 100.0 if total > 0 else 0.0
     
     # Métricas principales
@@ -194,12 +342,12 @@ def main():
         st.markdown(f"""
         <div class="metric-card">
             <h3 style="margin: 0; color: white;">👥 Jugadores</h3>
-            <p style="font-size: 1.5rem; margin: 0; color: white;">{len(agg_last)}</p>
+            <p style="font-size: 1.5rem; margin: 0; color: white;">{n_players}</p>
         </div>
         """, unsafe_allow_html=True)
     
     with col3:
-        avg_damage = total // len(agg_last) if len(agg_last) > 0 else 0
+        avg_damage = total // n_players if n_players > 0 else 0
         st.markdown(f"""
         <div class="metric-card">
             <h3 style="margin: 0; color: white;">📊 Promedio</h3>
@@ -211,7 +359,7 @@ def main():
         st.markdown(f"""
         <div class="metric-card">
             <h3 style="margin: 0; color: white;">🎯 Top Player</h3>
-            <p style="font-size: 1.2rem; margin: 0; color: white;">{agg_last.iloc[0]['name'] if len(agg_last) > 0 else 'N/A'}</p>
+            <p style="font-size: 1.2rem; margin: 0; color: white;">{top_player or 'N/A'}</p>
         </div>
         """, unsafe_allow_html=True)
     
@@ -219,15 +367,11 @@ def main():
     
     # Tabla de participación con rounds
     display = agg_last.head(top_n) if top_n > 0 else agg_last
-    display = display.copy()
-    display["pct"] = display["pct"].map(lambda v: f"{v:.2f}%")
+    display = display.assign(pct=[f"{v:.2f}%" for v in display["pct"].tolist()])
     
-    # Obtener rounds de cada jugador
-    rounds_data = pd.read_sql_query(f'SELECT username, rounds FROM "{sel_last}"', conn)
-    rounds_data['rounds'] = rounds_data['rounds'].fillna('N/A')
-    rounds_data['name'] = rounds_data['username'].astype(str).str.upper()
-    
-    display = display.merge(rounds_data[['name', 'rounds']], on='name', how='left')
+    # Rounds solo de los jugadores visibles (ya incluidos en last_df)
+    rounds_top = last_df.loc[last_df['name'].isin(display['name']), ['name', 'rounds']]
+    display = display.merge(rounds_top, on='name', how='left')
     display['rounds'] = display['rounds'].fillna('N/A')
     
     st.subheader("📋 Participación por Jugador")
@@ -236,148 +380,101 @@ def main():
         "damage": "Daño", 
         "pct": "% Participación",
         "rounds": "Rounds"
-    }), use_container_width=True)
+    }), column_config={"Daño": st.column_config.NumberColumn(format="%,d")}, use_container_width=True)
     
     # Gráficos de distribución
     st.markdown("### 🎯 Distribución del Daño")
+    top10 = agg_last.head(10)
+    # agg_last ya viene ordenado desc: invertir la vista basta para las barras ascendentes
+    top10_asc = top10.iloc[::-1]
     col1, col2 = st.columns(2)
     
     with col1:
-        fig_pie = px.pie(
-            agg_last.head(10), 
-            values='damage', 
-            names='name',
-            title='Top 10 Players - Distribución de Daño',
-            color_discrete_sequence=px.colors.qualitative.Set3
-        )
-        fig_pie.update_traces(textposition='inside', textinfo='percent+label')
-        fig_pie.update_layout(showlegend=True, height=400)
+        fig_pie = make_pie(tuple(top10["name"]), tuple(top10["damage"]))
         st.plotly_chart(fig_pie, use_container_width=True)
     
     with col2:
-        fig_bar = px.bar(
-            agg_last.head(10).sort_values('damage', ascending=True),
-            x='damage', 
-            y='name',
-            title='Top 10 Players - Daño Total',
-            orientation='h',
-            color='damage',
-            color_continuous_scale='viridis'
-        )
-        fig_bar.update_layout(height=400, showlegend=False)
+        fig_bar = make_damage_bar(tuple(top10_asc["name"]), tuple(top10_asc["damage"]))
         st.plotly_chart(fig_bar, use_container_width=True)
     
     st.markdown("---")
     
     # Comparación de daño
     st.markdown("### 📈 Comparación de Daño: Raid Anterior vs Actual")
-    st.write(f"📊 Comparando: `{sel_prev}` → `{sel_last}`")
-    comp = compute_comparison(prev_df, last_df)
-    
-    # Resumen rápido
-    increased = (comp["change"] == "up").sum()
-    decreased = (comp["change"] == "down").sum()
-    new_players = (comp["change"] == "new").sum()
-    st.write(f"🔼 {increased} incrementos — 🔽 {decreased} decrementos — 🆕 {new_players} nuevos")
-    
-    # Tabla de comparación con iconos
-    comp_display = comp.copy()
-    comp_display["pct_change"] = comp_display["pct_change"].map(fmt_pct)
-    
-    icon_map = {
-        "up": "🔼",
-        "down": "🔽", 
-        "new": "🆕",
-        "same": "⏺"
-    }
-    comp_display["Tipo"] = comp_display["change"].map(icon_map)
-    comp_display = comp_display.rename(columns={
-        "name": "Jugador", 
-        "prev_damage": "Anterior", 
-        "last_damage": "Actual", 
-        "pct_change": "% Cambio"
-    })
-    comp_display_show = comp_display.head(top_n) if top_n > 0 else comp_display
-    
-    columns_order = ["Tipo", "Jugador", "Anterior", "Actual", "% Cambio"]
-    st.dataframe(
-        comp_display_show[columns_order], 
-        use_container_width=True,
-        column_config={
-            "Tipo": st.column_config.TextColumn("Tendencia", width=None)
-        }
-    )
+    if same_table:
+        st.info("🔁 Selecciona tablas distintas para comparar")
+    else:
+        st.write(f"📊 Comparando: `{sel_prev}` → `{sel_last}`")
+        comp = compute_comparison(agg_prev, agg_last)
+    
+        # Resumen rápido
+        _, increased, decreased, new_players = np.bincount(comp["change"].cat.codes.to_numpy(), minlength=len(CHANGE_LABELS))
+        st.write(f"🔼 {increased} incrementos — 🔽 {decreased} decrementos — 🆕 {new_players} nuevos")
+    
+        # Tabla de comparación con iconos (se formatea solo el top N visible)
+        comp_top = comp.head(top_n) if top_n > 0 else comp
+    
+        comp_display = comp_top.assign(
+            pct_change=fmt_pct(comp_top["pct_change"].to_numpy()),
+            Tipo=CHANGE_ICONS[comp_top["change"].cat.codes.to_numpy()],
+        ).rename(columns={
+            "name": "Jugador", 
+            "prev_damage": "Anterior", 
+            "last_damage": "Actual", 
+            "pct_change": "% Cambio"
+        })
+    
+        columns_order = ["Tipo", "Jugador", "Anterior", "Actual", "% Cambio"]
+        st.dataframe(
+            comp_display[columns_order], 
+            use_container_width=True,
+            column_config={
+                "Tipo": st.column_config.TextColumn("Tendencia", width=None),
+                "Anterior": st.column_config.NumberColumn(format="%,d"),
+                "Actual": st.column_config.NumberColumn(format="%,d"),
+            }
+        )
     
-    # Gráficos de tendencias
-    st.markdown("### 📈 Análisis de Tendencias")
-    col1, col2 = st.columns(2)
+        # Gráficos de tendencias
+        st.markdown("### 📈 Análisis de Tendencias")
+        col1, col2 = st.columns(2)
     
-    top_up = comp[comp["change"] == "up"].nlargest(10, "pct_change")
-    top_down = comp[comp["change"] == "down"].nsmallest(10, "pct_change")
+        top_up = top_changes(comp, "up")
+        top_down = top_changes(comp, "down")
     
-    with col1:
-        if not top_up.empty:
-            fig_up = go.Figure(data=[
-                go.Bar(
-                    x=top_up['name'],
-                    y=top_up['pct_change'],
-                    marker_color='lightgreen',
-                    text=top_up['pct_change'].apply(lambda x: f"{x:+.1f}%"),
-                    textposition='auto',
+        with col1:
+            if not top_up.empty:
+                fig_up = make_change_bar(
+                    tuple(top_up['name']), tuple(top_up['pct_change']), 'lightgreen', '🚀 Top 10 Mayores Incrementos (%)'
                 )
-            ])
-            fig_up.update_layout(
-                title='🚀 Top 10 Mayores Incrementos (%)',
-                xaxis_title='Jugador',
-                yaxis_title='Cambio Porcentual',
-                height=400,
-                showlegend=False
-            )
-            st.plotly_chart(fig_up, use_container_width=True)
-        else:
-            st.info("🚀 No hay incrementos detectados.")
+                st.plotly_chart(fig_up, use_container_width=True)
+            else:
+                st.info("🚀 No hay incrementos detectados.")
     
-    with col2:
-        if not top_down.empty:
-            fig_down = go.Figure(data=[
-                go.Bar(
-                    x=top_down['name'],
-                    y=top_down['pct_change'],
-                    marker_color='lightcoral',
-                    text=top_down['pct_change'].apply(lambda x: f"{x:+.1f}%"),
-                    textposition='auto',
+        with col2:
+            if not top_down.empty:
+                fig_down = make_change_bar(
+                    tuple(top_down['name']), tuple(top_down['pct_change']), 'lightcoral', '📉 Top 10 Mayores Decrementos (%)'
                 )
-            ])
-            fig_down.update_layout(
-                title='📉 Top 10 Mayores Decrementos (%)',
-                xaxis_title='Jugador',
-                yaxis_title='Cambio Porcentual',
-                height=400,
-                showlegend=False
-            )
-            st.plotly_chart(fig_down, use_container_width=True)
-        else:
-            st.info("📉 No hay decrementos detectados.")
-    
-    # Nota explicativa
-    st.markdown("""
-    <div style="background: #667eea; padding: 1rem; border-radius: 10px; color: white; margin-top: 1rem; width: 100%;">
-        <p style="margin: 0; font-size: 0.9rem;">💡 <strong>Nota:</strong> Esta comparación muestra la diferencia del daño de cada jugador entre la raid anterior y la pasada.</p>
-    </div>
-    """, unsafe_allow_html=True)
+                st.plotly_chart(fig_down, use_container_width=True)
+            else:
+                st.info("📉 No hay decrementos detectados.")
+    
+        # Nota explicativa
+        st.markdown("""
+        <div style="background: #667eea; padding: 1rem; border-radius: 10px; color: white; margin-top: 1rem; width: 100%;">
+            <p style="margin: 0; font-size: 0.9rem;">💡 <strong>Nota:</strong> Esta comparación muestra la diferencia del daño de cada jugador entre la raid anterior y la pasada.</p>
+        </div>
+        """, unsafe_allow_html=True)
     
     # Sección de jugadores más activos (21/21 rounds)
     st.markdown("### 🏆 Jugadores Más Activos (21/21 Rounds)")
     
-    # Obtener datos de rounds
-    rounds_data = pd.read_sql_query(f'SELECT username, rounds, damage FROM "{sel_last}"', conn)
-    rounds_data['rounds'] = rounds_data['rounds'].fillna('N/A')
-    active_players = rounds_data[rounds_data['rounds'] == '21/21'].copy()
+    active_players = last_df[last_df['is_full']]
     
     if not active_players.empty:
         # Ordenar por damage
         active_players = active_players.sort_values('damage', ascending=False)
-        active_players['formatted_damage'] = active_players['damage'].apply(lambda x: f"{x:,}")
         
         # Métricas de jugadores activos
         total_active = len(active_players)
@@ -414,38 +511,30 @@ def main():
         # Tabla de jugadores activos
         st.markdown("#### 🏅 Ranking de Jugadores Activos")
         
-        display_active = active_players[['username', 'formatted_damage']].copy()
-        display_active.columns = ['Jugador', 'Damage Formateado']
-        
-        display_active['Posición'] = range(1, len(display_active) + 1)
-        display_active = display_active[['Posición', 'Jugador', 'Damage Formateado']]
+        # Tabla Arrow: st.dataframe la serializa sin pasar por pandas
+        display_active = pa.table({
+            'Posición': pa.array(np.arange(1, len(active_players) + 1, dtype=np.int32)),
+            'Jugador': pa.array(active_players['username']),
+            'Damage': pa.array(active_players['damage']),
+        })
         
         st.dataframe(
             display_active,
             column_config={
                 "Posición": st.column_config.NumberColumn(format="%d"),
-                "Damage Formateado": st.column_config.TextColumn("Damage")
+                "Damage": st.column_config.NumberColumn(format="%,d"),
             },
             hide_index=True,
             use_container_width=True
         )
         
         # Gráfico de barras para jugadores activos
-        fig_active = px.bar(
-            active_players.head(15).sort_values('damage', ascending=True),
-            x='damage',
-            y='username',
-            orientation='h',
-            title='🏆 Top 15 Jugadores Activos (21/21)',
-            color='damage',
-            color_continuous_scale='plasma',
-            labels={'damage': 'Damage', 'username': 'Jugador'}
-        )
-        fig_active.update_layout(height=600, showlegend=False)
+        top_active = active_players.head(15)
+        fig_active = make_active_bar(tuple(top_active['username']), tuple(top_active['damage']))
         st.plotly_chart(fig_active, use_container_width=True)
         
         # Porcentaje de participación
-        active_participation = (total_active / len(agg_last)) * 100
+        active_participation = (total_active / n_players) * 100
         st.markdown(f"""
         #### 📈 Participación
         **{active_participation:.1f}%** de los jugadores completaron todos sus ataques (21/21)